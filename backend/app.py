@@ -3,11 +3,14 @@ Kling AI Clone - Main Flask Application
 Video Generation API Server
 """
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Request, request, jsonify, send_file, Response, stream_with_context
 from flask_cors import CORS
 import os
 import uuid
 import json
+import shutil
+import tarfile
+import zipfile
 from datetime import datetime
 from pathlib import Path
 import threading
@@ -17,9 +20,23 @@ from config import Config
 from models.model_loader import ModelLoader
 from models.text_to_video import TextToVideoGenerator
 from models.image_to_video import ImageToVideoGenerator
+from profiling import JobProfiler
+
+
+
+class UploadRequest(Request):
+    """Request with a body limit per route: only batch uploads may be large"""
+    
+    @property
+    def max_content_length(self):
+        if self.endpoint == 'submit_batch' and not self.is_json:
+            return Config.MAX_BATCH_UPLOAD_SIZE
+        return Config.MAX_REQUEST_SIZE
+
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 CORS(app)
 app.config.from_object(Config)
 
@@ -27,6 +44,7 @@ app.config.from_object(Config)
 os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
 os.makedirs(Config.UPLOAD_DIR, exist_ok=True)
 os.makedirs(Config.MODEL_DIR, exist_ok=True)
+os.makedirs(Config.PROFILE_DIR, exist_ok=True)
 
 # Initialize model loader
 model_loader = ModelLoader()
@@ -34,6 +52,11 @@ model_loader = ModelLoader()
 # Job queue and status tracking
 job_queue = Queue()
 job_status = {}
+batches = {}
+job_lock = threading.Lock()
+
+# Callbacks run (on the worker thread) whenever a job's status or progress changes
+job_listeners = []
 
 # Initialize generators
 text_to_video_gen = None
@@ -68,9 +91,16 @@ def process_job_queue():
         job = job_queue.get()
         job_id = job['job_id']
         
+        # Only jobs that asked for it are profiled; everything else runs untouched
+        profiler = JobProfiler(job_id) if job.get('profile') else None
+        
         try:
             job_status[job_id]['status'] = 'processing'
             job_status[job_id]['progress'] = 0
+            notify_job(job_id)
+            
+            if profiler:
+                profiler.start()
             
             if job['type'] == 'text_to_video':
                 result = text_to_video_gen.generate(
@@ -78,7 +108,8 @@ def process_job_queue():
                     num_frames=job.get('num_frames', 24),
                     fps=job.get('fps', 8),
                     output_path=job['output_path'],
-                    progress_callback=lambda p: update_progress(job_id, p)
+                    progress_callback=lambda p: update_progress(job_id, p),
+                    profiler=profiler
                 )
             elif job['type'] == 'image_to_video':
                 result = image_to_video_gen.generate(
@@ -86,19 +117,28 @@ def process_job_queue():
                     num_frames=job.get('num_frames', 24),
                     fps=job.get('fps', 8),
                     output_path=job['output_path'],
-                    progress_callback=lambda p: update_progress(job_id, p)
+                    progress_callback=lambda p: update_progress(job_id, p),
+                    profiler=profiler
                 )
             
             job_status[job_id]['status'] = 'completed'
             job_status[job_id]['progress'] = 100
             job_status[job_id]['output_path'] = result['output_path']
             job_status[job_id]['completed_at'] = datetime.now().isoformat()
-            
+        
         except Exception as e:
             job_status[job_id]['status'] = 'failed'
             job_status[job_id]['error'] = str(e)
             print(f"❌ Job {job_id} failed: {str(e)}")
         
+        if profiler:
+            try:
+                job_status[job_id]['profile_artifacts'] = profiler.finish()
+            except Exception as e:
+                job_status[job_id]['profile_error'] = str(e)
+                print(f"⚠️  Could not save profile for job {job_id}: {str(e)}")
+        
+        notify_job(job_id)
         job_queue.task_done()
 
 
@@ -106,6 +146,20 @@ def update_progress(job_id, progress):
     """Update job progress"""
     if job_id in job_status:
         job_status[job_id]['progress'] = progress
+        notify_job(job_id)
+
+
+def notify_job(job_id):
+    """Let listeners (e.g. progress streams) know a job changed"""
+    for listener in job_listeners:
+        listener(job_id)
+
+
+def start_worker():
+    """Start the background thread that processes the job queue"""
+    worker_thread = threading.Thread(target=process_job_queue, daemon=True)
+    worker_thread.start()
+    return worker_thread
 
 
 @app.route('/api/health', methods=['GET'])
@@ -145,15 +199,18 @@ def generate_text_to_video():
         'prompt': prompt,
         'num_frames': data.get('num_frames', 24),
         'fps': data.get('fps', 8),
-        'output_path': output_path
+        'output_path': output_path,
+        'profile': parse_flag(data.get('profile', False))
     }
     
-    job_status[job_id] = {
-        'status': 'queued',
-        'progress': 0,
-        'created_at': datetime.now().isoformat(),
-        'prompt': prompt
-    }
+    with job_lock:
+        job_status[job_id] = {
+            'status': 'queued',
+            'progress': 0,
+            'created_at': datetime.now().isoformat(),
+            'prompt': prompt,
+            'profile': job['profile']
+        }
     
     job_queue.put(job)
     
@@ -174,13 +231,43 @@ def generate_image_to_video():
         return jsonify({'error': 'Image file is required'}), 400
     
     image_file = request.files['image']
+    if file_size(image_file.stream) > Config.MAX_UPLOAD_SIZE:
+        return jsonify({'error': f'Image exceeds {Config.MAX_UPLOAD_SIZE // (1024 * 1024)}MB'}), 413
     
     # Save uploaded image
     job_id = str(uuid.uuid4())
-    image_filename = f"{job_id}_input.png"
-    image_path = os.path.join(Config.UPLOAD_DIR, image_filename)
+    image_path = upload_path(job_id)
     image_file.save(image_path)
     
+    return jsonify(queue_image_to_video(
+        job_id,
+        image_path,
+        num_frames=int(request.form.get('num_frames', 24)),
+        fps=int(request.form.get('fps', 8)),
+        profile=parse_flag(request.form.get('profile', False))
+    ))
+
+
+def file_size(stream):
+    """Get the size of a seekable upload stream, leaving it at the start"""
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    return size
+
+
+def parse_flag(value):
+    """Parse a boolean request field sent as JSON (true) or form text ("true")"""
+    return str(value).lower() == 'true'
+
+
+def upload_path(job_id):
+    """Get the path an uploaded input image is saved to"""
+    return os.path.join(Config.UPLOAD_DIR, f"{job_id}_input.png")
+
+
+def queue_image_to_video(job_id, image_path, num_frames, fps, profile=False):
+    """Queue an image-to-video job for an already saved image"""
     output_filename = f"{job_id}.mp4"
     output_path = os.path.join(Config.OUTPUT_DIR, output_filename)
     
@@ -188,24 +275,27 @@ def generate_image_to_video():
         'job_id': job_id,
         'type': 'image_to_video',
         'image_path': image_path,
-        'num_frames': int(request.form.get('num_frames', 24)),
-        'fps': int(request.form.get('fps', 8)),
-        'output_path': output_path
+        'num_frames': num_frames,
+        'fps': fps,
+        'output_path': output_path,
+        'profile': profile
     }
     
-    job_status[job_id] = {
-        'status': 'queued',
-        'progress': 0,
-        'created_at': datetime.now().isoformat()
-    }
+    with job_lock:
+        job_status[job_id] = {
+            'status': 'queued',
+            'progress': 0,
+            'created_at': datetime.now().isoformat(),
+            'profile': profile
+        }
     
     job_queue.put(job)
     
-    return jsonify({
+    return {
         'job_id': job_id,
         'status': 'queued',
         'message': 'Video generation job queued successfully'
-    })
+    }
 
 
 @app.route('/api/status/<job_id>', methods=['GET'])
@@ -236,29 +326,407 @@ def download_video(job_id):
     return send_file(output_path, as_attachment=True, download_name=f"video_{job_id}.mp4")
 
 
+@app.route('/api/profile/<job_id>', methods=['GET'])
+def get_job_profile(job_id):
+    """Get the profiling summary and artifact list of a profiled job"""
+    if job_id not in job_status:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    job = job_status[job_id]
+    
+    if not job.get('profile'):
+        return jsonify({'error': 'Job was not profiled'}), 400
+    
+    if 'profile_error' in job:
+        return jsonify({'error': f"Profile could not be saved: {job['profile_error']}"}), 500
+    
+    if 'profile_artifacts' not in job:
+        return jsonify({'error': 'Profile not ready yet'}), 400
+    
+    with open(Config.PROFILE_DIR / job_id / "summary.json") as f:
+        summary = json.load(f)
+    
+    return jsonify({
+        'job_id': job_id,
+        'artifacts': job['profile_artifacts'],
+        'summary': summary
+    })
+
+
+@app.route('/api/profile/<job_id>/<artifact>', methods=['GET'])
+def download_profile_artifact(job_id, artifact):
+    """Download a profiling artifact (Chrome trace, cProfile stats, memory snapshot)"""
+    if job_id not in job_status:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    if artifact not in job_status[job_id].get('profile_artifacts', []):
+        return jsonify({'error': 'Artifact not found'}), 404
+    
+    return send_file(Config.PROFILE_DIR / job_id / artifact, as_attachment=True)
+
+
 @app.route('/api/jobs', methods=['GET'])
 def list_jobs():
     """List all jobs"""
+    with job_lock:
+        jobs = list(job_status.items())
+    
     return jsonify({
         'jobs': [
             {
                 'job_id': job_id,
                 **status
             }
-            for job_id, status in job_status.items()
+            for job_id, status in jobs
         ]
     })
 
 
+def parse_batch_items():
+    """
+    Read the items of a batch submission
+    
+    Accepts a JSON body ({"prompts": [...]}), a JSONL body, or a multipart
+    form with a JSONL `prompts` file and/or a zip/tar `images` archive.
+    Shared parameters come from the JSON body, form fields or query string.
+    """
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ValueError('Body must be a JSON object')
+        prompts = data.get('prompts', [])
+        if not isinstance(prompts, list):
+            raise ValueError('prompts must be a list')
+        return [p if isinstance(p, dict) else {'prompt': p} for p in prompts], [], data
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl', 'text/plain'):
+        return parse_jsonl(request.stream), [], request.args
+    
+    items = []
+    if 'prompts' in request.files:
+        items = parse_jsonl(request.files['prompts'].stream)
+    
+    images = []
+    if 'images' in request.files:
+        images = list_image_archive(request.files['images'])
+    
+    return items, images, request.form
+
+
+def parse_jsonl(stream):
+    """
+    Parse JSONL prompts, one {"prompt": ...} object (or bare string) per line
+    
+    The stream is read a line at a time and parsing stops as soon as the batch
+    would exceed MAX_BATCH_SIZE, so an oversized file is never held in memory.
+    """
+    items = []
+    line_number = 0
+    while True:
+        line = stream.readline(Config.MAX_JSONL_LINE + 1)
+        if not line:
+            break
+        line_number += 1
+        
+        if len(line) > Config.MAX_JSONL_LINE:
+            raise ValueError(f"Line {line_number} is longer than {Config.MAX_JSONL_LINE} bytes")
+        if not line.strip():
+            continue
+        if len(items) >= Config.MAX_BATCH_SIZE:
+            raise ValueError(f'Batch exceeds {Config.MAX_BATCH_SIZE} jobs')
+        
+        try:
+            item = json.loads(line)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise ValueError(f"Invalid JSON on line {line_number}")
+        items.append(item if isinstance(item, dict) else {'prompt': item})
+    return items
+
+
+def list_image_archive(archive_file):
+    """
+    List the allowed images in a zip or tar archive
+    
+    Only the archive index is read. Member count and sizes are checked against
+    the batch and upload limits before anything is extracted.
+    """
+    stream = archive_file.stream
+    
+    if zipfile.is_zipfile(stream):
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as archive:
+            members = (
+                (info.filename, info.file_size)
+                for info in archive.infolist() if not info.is_dir()
+            )
+            return check_archive_members(members)
+    
+    stream.seek(0)
+    try:
+        with tarfile.open(fileobj=stream, mode='r:*') as archive:
+            # Iterating reads one header at a time, so the count check stops early
+            members = ((member.name, member.size) for member in archive if member.isfile())
+            return check_archive_members(members)
+    except tarfile.TarError:
+        raise ValueError('Images archive must be a zip or tar file')
+
+
+def check_archive_members(members):
+    """Collect (name, size) of allowed images, enforcing batch and upload limits"""
+    images = {}
+    for name, size in members:
+        if not is_allowed_image(name) or name in images:
+            continue
+        if size > Config.MAX_UPLOAD_SIZE:
+            raise ValueError(f'{name} exceeds {Config.MAX_UPLOAD_SIZE // (1024 * 1024)}MB')
+        if len(images) >= Config.MAX_BATCH_SIZE:
+            raise ValueError(f'Batch exceeds {Config.MAX_BATCH_SIZE} jobs')
+        images[name] = size
+    
+    return sorted(images)
+
+
+def extract_image_archive(archive_file, destinations):
+    """Stream the archive members in destinations ({name: path}) straight to disk"""
+    stream = archive_file.stream
+    stream.seek(0)
+    
+    if zipfile.is_zipfile(stream):
+        stream.seek(0)
+        with zipfile.ZipFile(stream) as archive:
+            for name, path in destinations.items():
+                with archive.open(name) as source, open(path, 'wb') as f:
+                    shutil.copyfileobj(source, f)
+        return
+    
+    stream.seek(0)
+    with tarfile.open(fileobj=stream, mode='r:*') as archive:
+        # Extract in archive order: compressed tars can't seek backwards cheaply
+        for member in archive:
+            path = destinations.pop(member.name, None) if member.isfile() else None
+            if path:
+                with archive.extractfile(member) as source, open(path, 'wb') as f:
+                    shutil.copyfileobj(source, f)
+
+
+def is_allowed_image(filename):
+    """Check whether a filename has an allowed image extension"""
+    name = os.path.basename(filename)
+    return not name.startswith('.') and name.rsplit('.', 1)[-1].lower() in Config.ALLOWED_EXTENSIONS
+
+
+@app.route('/api/batch', methods=['POST'])
+def submit_batch():
+    """Submit many text/image-to-video jobs with shared parameters at once"""
+    try:
+        items, images, params = parse_batch_items()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    if not items and not images:
+        return jsonify({'error': 'Batch contains no prompts or images'}), 400
+    
+    if len(items) + len(images) > Config.MAX_BATCH_SIZE:
+        return jsonify({'error': f'Batch exceeds {Config.MAX_BATCH_SIZE} jobs'}), 400
+    
+    if items and not text_to_video_gen:
+        return jsonify({'error': 'Text-to-video model not loaded'}), 503
+    
+    if images and not image_to_video_gen:
+        return jsonify({'error': 'Image-to-video model not loaded'}), 503
+    
+    try:
+        num_frames = int(params.get('num_frames', 24))
+        fps = int(params.get('fps', 8))
+        for item in items:
+            if not item.get('prompt') or not isinstance(item['prompt'], str):
+                raise ValueError('Every item needs a prompt')
+            item['num_frames'] = int(item.get('num_frames', num_frames))
+            item['fps'] = int(item.get('fps', fps))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    batch_id = str(uuid.uuid4())
+    created_at = datetime.now().isoformat()
+    jobs = []
+    
+    for item in items:
+        job_id = str(uuid.uuid4())
+        jobs.append({
+            'job_id': job_id,
+            'type': 'text_to_video',
+            'prompt': item['prompt'],
+            'num_frames': item['num_frames'],
+            'fps': item['fps'],
+            'output_path': os.path.join(Config.OUTPUT_DIR, f"{job_id}.mp4"),
+            'batch_id': batch_id
+        })
+    
+    destinations = {}
+    for filename in images:
+        job_id = str(uuid.uuid4())
+        extension = filename.rsplit('.', 1)[-1].lower()
+        image_path = os.path.join(Config.UPLOAD_DIR, f"{job_id}_input.{extension}")
+        destinations[filename] = image_path
+        
+        jobs.append({
+            'job_id': job_id,
+            'type': 'image_to_video',
+            'image_path': image_path,
+            'source_image': filename,
+            'num_frames': num_frames,
+            'fps': fps,
+            'output_path': os.path.join(Config.OUTPUT_DIR, f"{job_id}.mp4"),
+            'batch_id': batch_id
+        })
+    
+    if destinations:
+        try:
+            extract_image_archive(request.files['images'], dict(destinations))
+        except (zipfile.BadZipFile, tarfile.TarError, EOFError) as e:
+            for image_path in destinations.values():
+                if os.path.exists(image_path):
+                    os.remove(image_path)
+            return jsonify({'error': f'Could not extract images archive: {e}'}), 400
+    
+    # Group jobs that use the same pipeline and settings so the worker runs them back to back
+    jobs.sort(key=lambda job: (job['type'], job['num_frames'], job['fps']))
+    
+    # Register the whole batch at once so it is never visible half-submitted
+    with job_lock:
+        for job in jobs:
+            status = {
+                'status': 'queued',
+                'progress': 0,
+                'created_at': created_at,
+                'batch_id': batch_id
+            }
+            if 'prompt' in job:
+                status['prompt'] = job['prompt']
+            if 'source_image' in job:
+                status['source_image'] = job['source_image']
+            job_status[job['job_id']] = status
+        
+        batches[batch_id] = {
+            'created_at': created_at,
+            'job_ids': [job['job_id'] for job in jobs]
+        }
+        
+        for job in jobs:
+            job_queue.put(job)
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'total': len(jobs),
+        'status': 'queued',
+        'message': 'Batch queued successfully'
+    })
+
+
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch_status(batch_id):
+    """Get aggregate status of a batch"""
+    if batch_id not in batches:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    batch = batches[batch_id]
+    counts = {'queued': 0, 'processing': 0, 'completed': 0, 'failed': 0}
+    total_progress = 0
+    jobs = []
+    
+    for job_id in batch['job_ids']:
+        job = job_status[job_id]
+        counts[job['status']] = counts.get(job['status'], 0) + 1
+        total_progress += job['progress']
+        jobs.append({'job_id': job_id, 'status': job['status'], 'progress': job['progress']})
+    
+    total = len(batch['job_ids'])
+    
+    return jsonify({
+        'batch_id': batch_id,
+        'created_at': batch['created_at'],
+        'total': total,
+        'counts': counts,
+        'progress': total_progress / total if total else 100,
+        'done': counts['completed'] + counts['failed'] == total,
+        'jobs': jobs
+    })
+
+
+class StreamBuffer:
+    """Write-only file object that hands written bytes back to a streaming response"""
+    
+    def __init__(self):
+        self.chunks = []
+    
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def stream_archive(outputs, archive_format):
+    """Yield a zip or tar archive of (arcname, path) outputs without building it in memory"""
+    buffer = StreamBuffer()
+    
+    if archive_format == 'tar':
+        archive = tarfile.open(fileobj=buffer, mode='w|')
+        add = archive.add
+    else:
+        # Videos are already compressed, so store them as-is
+        archive = zipfile.ZipFile(buffer, mode='w', compression=zipfile.ZIP_STORED)
+        add = archive.write
+    
+    with archive:
+        for arcname, path in outputs:
+            add(path, arcname=arcname)
+            yield buffer.drain()
+    
+    yield buffer.drain()
+
+
+@app.route('/api/batch/<batch_id>/download', methods=['GET'])
+def download_batch(batch_id):
+    """Stream a zip (default) or tar (?format=tar) of the batch's completed videos"""
+    if batch_id not in batches:
+        return jsonify({'error': 'Batch not found'}), 404
+    
+    archive_format = request.args.get('format', 'zip')
+    if archive_format not in ('zip', 'tar'):
+        return jsonify({'error': 'Format must be zip or tar'}), 400
+    
+    outputs = [
+        (f"video_{job_id}.mp4", job_status[job_id]['output_path'])
+        for job_id in batches[batch_id]['job_ids']
+        if job_status[job_id]['status'] == 'completed'
+        and os.path.exists(job_status[job_id]['output_path'])
+    ]
+    
+    if not outputs:
+        return jsonify({'error': 'No completed videos yet'}), 400
+    
+    return Response(
+        stream_with_context(stream_archive(outputs, archive_format)),
+        mimetype='application/zip' if archive_format == 'zip' else 'application/x-tar',
+        headers={'Content-Disposition': f'attachment; filename=batch_{batch_id}.{archive_format}'}
+    )
+
+
 if __name__ == '__main__':
     # Start background worker thread
-    worker_thread = threading.Thread(target=process_job_queue, daemon=True)
-    worker_thread.start()
+    start_worker()
     
     # Initialize models
     initialize_models()
     
-    # Start Flask server
+    # Start Flask development server (use serve.py in production)
     print(f"\n🚀 Server starting on http://{Config.HOST}:{Config.PORT}")
     print(f"📁 Output directory: {Config.OUTPUT_DIR}")
     print(f"📁 Model directory: {Config.MODEL_DIR}\n")
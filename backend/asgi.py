@@ -0,0 +1,229 @@
+"""
+Kling AI Clone - ASGI Application
+Serves uploads, status reads, downloads and progress streams on the event loop
+and hands every other route to the Flask app on a thread pool
+"""
+
+import asyncio
+import json
+import os
+import shutil
+import uuid
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, FileResponse, StreamingResponse
+from starlette.routing import Route, Mount
+
+import app as api
+from config import Config
+
+
+class JobEvents:
+    """Bridges job updates from the worker thread to coroutines waiting on them"""
+    
+    def __init__(self):
+        self.loop = None
+        self.waiters = {}
+    
+    def attach(self, loop):
+        """Start receiving job updates on the given event loop"""
+        self.loop = loop
+        api.job_listeners.append(self.notify)
+    
+    def detach(self):
+        """Stop receiving job updates"""
+        api.job_listeners.remove(self.notify)
+        self.loop = None
+    
+    def notify(self, job_id):
+        """Called on the worker thread; wakes waiters on the event loop"""
+        if self.loop is not None and job_id in self.waiters:
+            self.loop.call_soon_threadsafe(self._wake, job_id)
+    
+    def _wake(self, job_id):
+        for event in self.waiters.get(job_id, ()):
+            event.set()
+    
+    def subscribe(self, job_id):
+        """Get an event that is set whenever the job changes"""
+        event = asyncio.Event()
+        self.waiters.setdefault(job_id, set()).add(event)
+        return event
+    
+    def unsubscribe(self, job_id, event):
+        waiters = self.waiters.get(job_id, set())
+        waiters.discard(event)
+        if not waiters:
+            self.waiters.pop(job_id, None)
+
+
+job_events = JobEvents()
+
+
+class BodyTooLarge(Exception):
+    """Raised while reading a request body that exceeds its limit"""
+
+
+def limit_body(request, max_size):
+    """
+    Get a view of request whose body stops being read past max_size bytes
+    
+    Bytes are counted as they arrive, so chunked uploads (no Content-Length)
+    are limited too.
+    """
+    received = 0
+    
+    async def receive():
+        nonlocal received
+        message = await request.receive()
+        if message['type'] == 'http.request':
+            received += len(message.get('body', b''))
+            if received > max_size:
+                raise BodyTooLarge()
+        return message
+    
+    return Request(request.scope, receive)
+
+
+async def get_job_status(request):
+    """Get status of a video generation job"""
+    job_id = request.path_params['job_id']
+    if job_id not in api.job_status:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+    
+    # Copy first: the worker thread may add keys while we serialize
+    return JSONResponse(dict(api.job_status[job_id]))
+
+
+async def stream_job_status(request):
+    """Stream job status as server-sent events until the job finishes"""
+    job_id = request.path_params['job_id']
+    if job_id not in api.job_status:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+    
+    async def events():
+        event = job_events.subscribe(job_id)
+        last_sent = None
+        try:
+            while True:
+                # Clear before reading so an update that lands mid-read isn't lost
+                event.clear()
+                status = dict(api.job_status[job_id])
+                payload = json.dumps(status)
+                
+                if payload != last_sent:
+                    yield f"data: {payload}\n\n"
+                    last_sent = payload
+                
+                if status['status'] in ('completed', 'failed'):
+                    break
+                
+                try:
+                    await asyncio.wait_for(event.wait(), Config.PROGRESS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+        finally:
+            job_events.unsubscribe(job_id, event)
+    
+    return StreamingResponse(
+        events(),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+async def download_video(request):
+    """Download generated video"""
+    job_id = request.path_params['job_id']
+    if job_id not in api.job_status:
+        return JSONResponse({'error': 'Job not found'}, status_code=404)
+    
+    job = api.job_status[job_id]
+    
+    if job['status'] != 'completed':
+        return JSONResponse({'error': 'Video not ready yet'}, status_code=400)
+    
+    output_path = job.get('output_path')
+    
+    if not output_path or not os.path.exists(output_path):
+        return JSONResponse({'error': 'Video file not found'}, status_code=404)
+    
+    return FileResponse(output_path, filename=f"video_{job_id}.mp4")
+
+
+async def generate_image_to_video(request):
+    """Generate video from image"""
+    if not api.image_to_video_gen:
+        return JSONResponse({'error': 'Image-to-video model not loaded'}, status_code=503)
+    
+    # Flask enforces the body limit for the routes it serves; this one bypasses it
+    content_length = request.headers.get('content-length')
+    if content_length is not None:
+        if not content_length.isdigit():
+            return JSONResponse({'error': 'Invalid Content-Length header'}, status_code=400)
+        if int(content_length) > Config.MAX_REQUEST_SIZE:
+            return JSONResponse({'error': 'Request body too large'}, status_code=413)
+    
+    try:
+        # The body is parsed as it arrives, so a slow upload only holds a coroutine
+        async with limit_body(request, Config.MAX_REQUEST_SIZE).form() as form:
+            image_file = form.get('image')
+            if image_file is None or isinstance(image_file, str):
+                return JSONResponse({'error': 'Image file is required'}, status_code=400)
+            
+            if api.file_size(image_file.file) > Config.MAX_UPLOAD_SIZE:
+                return JSONResponse(
+                    {'error': f'Image exceeds {Config.MAX_UPLOAD_SIZE // (1024 * 1024)}MB'},
+                    status_code=413
+                )
+            
+            try:
+                num_frames = int(form.get('num_frames', 24))
+                fps = int(form.get('fps', 8))
+                profile = api.parse_flag(form.get('profile', False))
+            except ValueError:
+                return JSONResponse({'error': 'num_frames and fps must be integers'}, status_code=400)
+            
+            job_id = str(uuid.uuid4())
+            image_path = api.upload_path(job_id)
+            await run_in_threadpool(save_upload, image_file.file, image_path)
+    except BodyTooLarge:
+        return JSONResponse({'error': 'Request body too large'}, status_code=413)
+    
+    return JSONResponse(api.queue_image_to_video(job_id, image_path, num_frames, fps, profile))
+
+
+def save_upload(source, path):
+    """Copy a spooled upload to disk"""
+    source.seek(0)
+    with open(path, 'wb') as f:
+        shutil.copyfileobj(source, f)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    job_events.attach(asyncio.get_running_loop())
+    yield
+    job_events.detach()
+
+
+asgi_app = Starlette(
+    routes=[
+        Route('/api/status/{job_id}', get_job_status, methods=['GET']),
+        Route('/api/status/{job_id}/stream', stream_job_status, methods=['GET']),
+        Route('/api/download/{job_id}', download_video, methods=['GET']),
+        Route('/api/generate/image-to-video', generate_image_to_video, methods=['POST']),
+        # Everything else is served by the Flask app
+        Mount('/', app=WSGIMiddleware(api.app, workers=Config.WSGI_THREADS))
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])
+    ],
+    lifespan=lifespan
+)
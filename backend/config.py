@@ -11,11 +11,18 @@ class Config:
     MODEL_DIR = BASE_DIR / "models_cache"
     OUTPUT_DIR = BASE_DIR / "outputs"
     UPLOAD_DIR = BASE_DIR / "uploads"
+    PROFILE_DIR = BASE_DIR / "profiles"
     
     # Server settings
     HOST = os.getenv("HOST", "0.0.0.0")
     PORT = int(os.getenv("PORT", 5000))
-    DEBUG = os.getenv("DEBUG", "True").lower() == "true"
+    DEBUG = os.getenv("DEBUG", "False").lower() == "true"
+    
+    # Production server settings (serve.py)
+    SERVER_LIMIT_CONCURRENCY = int(os.getenv("SERVER_LIMIT_CONCURRENCY", 2000))  # Max open connections before 503s
+    SERVER_KEEP_ALIVE = int(os.getenv("SERVER_KEEP_ALIVE", 5))  # Seconds to keep idle connections open
+    WSGI_THREADS = int(os.getenv("WSGI_THREADS", 16))  # Threads serving the remaining Flask routes
+    PROGRESS_KEEPALIVE = 15  # Seconds between keep-alive comments on progress streams
     
     # Model settings
     MODEL_TYPE = os.getenv("MODEL_TYPE", "stable-video-diffusion")
@@ -34,22 +41,40 @@ class Config:
     ENABLE_ATTENTION_SLICING = True
     ENABLE_VAE_SLICING = True
     ENABLE_CPU_OFFLOAD = False  # Set to True for GPUs with <12GB VRAM
+    ENABLE_VAE_TILING = True  # Let the decode planner fall back to tiled VAE decoding
+    DECODE_MEMORY_FRACTION = 0.8  # Share of free memory the decode planner may use
+    # Peak VAE decoder activations per output pixel. Measured on CPU (fp32, 512x320) with
+    # scripts/decode_benchmark.py: ~1360 for the SVD temporal decoder, 860-1100 for the SD VAE.
+    # Not yet measured on CUDA.
+    DECODE_ACTIVATIONS_PER_PIXEL = 1400
+    
+    # Model memory settings
+    SHARE_COMPONENTS = os.getenv("SHARE_COMPONENTS", "True").lower() == "true"  # Reuse identical VAEs/text encoders across pipelines
+    MMAP_WEIGHTS = os.getenv("MMAP_WEIGHTS", "True").lower() == "true"  # Share read-only weights between workers via the page cache
     
     # Model paths (Hugging Face)
     MODELS = {
         "stable-video-diffusion": "stabilityai/stable-video-diffusion-img2vid",
         "stable-video-diffusion-xt": "stabilityai/stable-video-diffusion-img2vid-xt",
         "text-to-video": "damo-vilab/text-to-video-ms-1.7b",
+        "text-to-image": "runwayml/stable-diffusion-v1-5",
         "animatediff": "guoyww/animatediff-motion-adapter-v1-5-2"
     }
     
     # Queue settings
     MAX_QUEUE_SIZE = 10
     MAX_CONCURRENT_JOBS = 1
+    MAX_BATCH_SIZE = 5000
     
     # File upload settings
-    MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB
+    MAX_UPLOAD_SIZE = 10 * 1024 * 1024  # 10MB per image
+    MAX_REQUEST_SIZE = MAX_UPLOAD_SIZE + 1024 * 1024  # Request bodies: one image plus form fields
+    MAX_BATCH_UPLOAD_SIZE = 2 * 1024 * 1024 * 1024  # 2GB for prompt files / image archives sent to /api/batch
+    MAX_JSONL_LINE = 64 * 1024  # Longest line accepted in a JSONL prompts file
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    
+    # Profiling (only for jobs submitted with "profile": true)
+    PROFILE_TOP_N = 50  # Functions / allocation sites kept in a profile summary
@@ -0,0 +1,145 @@
+"""
+Decode Planner - Picks VAE decode settings from available memory
+Chooses how many frames to decode at once (and whether to tile) from the
+measured free memory, and retries with a smaller plan on out-of-memory.
+"""
+
+import gc
+import torch
+import psutil
+
+from config import Config
+
+# Frames per VAE call with ENABLE_VAE_SLICING off (the fixed value used before planning)
+DEFAULT_CHUNK_SIZE = 8
+
+
+def is_out_of_memory(error):
+    """Check whether an exception was raised by running out of GPU or CPU memory"""
+    if isinstance(error, (MemoryError, torch.cuda.OutOfMemoryError)):
+        return True
+    
+    message = str(error).lower()
+    return isinstance(error, RuntimeError) and (
+        "out of memory" in message or "can't allocate memory" in message
+    )
+
+
+class DecodePlanner:
+    def __init__(self, model_loader):
+        self.model_loader = model_loader
+    
+    def free_memory(self):
+        """Get free memory in bytes on the device the VAE decodes on"""
+        if self.model_loader.get_device() == "cuda":
+            free, _ = torch.cuda.mem_get_info()
+            # Blocks PyTorch has cached but isn't using are free to this process too
+            return free + torch.cuda.memory_reserved() - torch.cuda.memory_allocated()
+        
+        return psutil.virtual_memory().available
+    
+    def frame_bytes(self, width, height):
+        """Estimate peak decoder memory needed for one output frame"""
+        element_size = torch.finfo(self.model_loader.get_dtype()).bits // 8
+        return width * height * Config.DECODE_ACTIVATIONS_PER_PIXEL * element_size
+    
+    def plan(self, width, height, num_frames, can_tile=True, chunked=True):
+        """
+        Pick a decode plan for a video
+        
+        Returns a dict with `chunk_size` (frames decoded per VAE call) and
+        `tiled` (decode each frame in tiles). Without `chunked` the pipeline can
+        only decode all frames at once or one at a time (VAE slicing).
+        """
+        if not Config.ENABLE_VAE_SLICING:
+            return {'chunk_size': min(num_frames, DEFAULT_CHUNK_SIZE) if chunked else num_frames, 'tiled': False}
+        
+        budget = self.free_memory() * Config.DECODE_MEMORY_FRACTION
+        chunk_size = int(budget // self.frame_bytes(width, height))
+        
+        if chunk_size >= num_frames:
+            return {'chunk_size': num_frames, 'tiled': False}
+        
+        if chunk_size >= 1:
+            return {'chunk_size': chunk_size if chunked else 1, 'tiled': False}
+        
+        # Not even one whole frame fits: decode one frame at a time, in tiles
+        return {'chunk_size': 1, 'tiled': Config.ENABLE_VAE_TILING and can_tile}
+    
+    def shrink(self, plan, can_tile=True, chunked=True):
+        """Get the next smaller plan to try after running out of memory, or None"""
+        if plan['chunk_size'] > 1:
+            return {**plan, 'chunk_size': plan['chunk_size'] // 2 if chunked else 1}
+        
+        if not plan['tiled'] and Config.ENABLE_VAE_TILING and can_tile:
+            return {'chunk_size': 1, 'tiled': True}
+        
+        return None
+    
+    def apply(self, pipe, plan, num_frames):
+        """Configure the pipeline's VAE for a plan"""
+        vae = pipe.vae
+        
+        # Checked through the flags: some VAEs inherit enable_tiling/enable_slicing
+        # methods that raise because they don't implement them
+        if hasattr(vae, 'use_tiling'):
+            if plan['tiled']:
+                vae.enable_tiling()
+            else:
+                vae.disable_tiling()
+        
+        # Pipelines without a decode_chunk_size argument decode the whole batch in
+        # one VAE call unless slicing splits it into single frames
+        if hasattr(vae, 'use_slicing'):
+            if plan['chunk_size'] < num_frames:
+                vae.enable_slicing()
+            else:
+                vae.disable_slicing()
+    
+    def run(self, pipe, decode, width, height, num_frames, chunked=True):
+        """
+        Run decode(chunk_size) under a memory-aware decode plan
+        
+        decode should only run the VAE on latents the pipeline already
+        produced, so a retry never repeats denoising. On out-of-memory the plan
+        is shrunk (halving the chunk size, then switching to tiled decoding)
+        and decode is retried. Pass chunked=False for pipelines that take no
+        chunk size, so only settings that change the VAE calls are tried.
+        
+        With ENABLE_VAE_SLICING off the VAE is left as configured and decode
+        runs once with the default chunk size, without retries.
+        """
+        can_tile = hasattr(pipe.vae, 'use_tiling')
+        plan = self.plan(width, height, num_frames, can_tile, chunked)
+        
+        if not Config.ENABLE_VAE_SLICING:
+            with torch.no_grad():
+                return decode(plan['chunk_size'])
+        
+        while True:
+            self.apply(pipe, plan, num_frames)
+            print(f"🧮 Decode plan: {plan['chunk_size']} frame(s) per chunk, tiled={plan['tiled']}")
+            
+            try:
+                # Decoding runs outside the pipeline call, so it needs its own no_grad
+                with torch.no_grad():
+                    return decode(plan['chunk_size'])
+            except Exception as e:
+                if not is_out_of_memory(e):
+                    raise
+                
+                smaller = self.shrink(plan, can_tile, chunked)
+                if smaller is None:
+                    raise
+                
+                print("⚠️  Out of memory while decoding, retrying with a smaller decode plan")
+                plan = smaller
+            
+            # Outside the except block, so the traceback no longer pins the failed attempt's tensors
+            self.release_memory()
+    
+    def release_memory(self):
+        """Free cached memory left behind by a failed attempt"""
+        gc.collect()
+        if self.model_loader.get_device() == "cuda":
+            torch.cuda.empty_cache()
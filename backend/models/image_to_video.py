@@ -8,12 +8,29 @@ from PIL import Image
 import numpy as np
 import imageio
 
+from models.decode_planner import DecodePlanner
+from profiling import profile_stage
+
+
+def decode_svd_latents(pipe, latents, num_frames, chunk_size):
+    """Decode Stable Video Diffusion latents to PIL frames, chunk_size frames per VAE call"""
+    video = pipe.decode_latents(latents, num_frames, chunk_size)
+    
+    if hasattr(pipe, 'video_processor'):
+        return pipe.video_processor.postprocess_video(video=video, output_type="pil")[0]
+    
+    # diffusers < 0.27
+    from diffusers.pipelines.stable_video_diffusion.pipeline_stable_video_diffusion import tensor2vid
+    return tensor2vid(video, pipe.image_processor, output_type="pil")[0]
+
+
 class ImageToVideoGenerator:
     def __init__(self, model_loader):
         self.model_loader = model_loader
         self.pipe = self.model_loader.load_stable_video_diffusion()
+        self.decode_planner = DecodePlanner(model_loader)
     
-    def generate(self, image_path, num_frames=25, fps=8, output_path=None, progress_callback=None):
+    def generate(self, image_path, num_frames=25, fps=8, output_path=None, progress_callback=None, profiler=None):
         """
         Generate video from image
         
@@ -23,6 +40,7 @@ class ImageToVideoGenerator:
             fps: Frames per second
             output_path: Where to save the video
             progress_callback: Function to call with progress updates
+            profiler: Optional JobProfiler recording each stage
         
         Returns:
             dict with output_path and metadata
@@ -32,11 +50,12 @@ class ImageToVideoGenerator:
         
         print(f"🖼️  Loading image: {image_path}")
         
-        # Load and preprocess image
-        image = Image.open(image_path).convert("RGB")
-        
-        # Resize to optimal size (SVD works best with 1024x576)
-        image = image.resize((1024, 576))
+        with profile_stage(profiler, 'load_image'):
+            # Load and preprocess image
+            image = Image.open(image_path).convert("RGB")
+            
+            # Resize to optimal size (SVD works best with 1024x576)
+            image = image.resize((1024, 576))
         
         if progress_callback:
             progress_callback(30)
@@ -44,15 +63,26 @@ class ImageToVideoGenerator:
         print(f"🎬 Generating {num_frames} frames...")
         
         try:
-            # Generate video frames
-            frames = self.pipe(
-                image,
-                num_frames=num_frames,
-                decode_chunk_size=8,
-                num_inference_steps=25,
-                min_guidance_scale=1.0,
-                max_guidance_scale=3.0
-            ).frames[0]
+            # Denoise once; an out-of-memory here fails the job
+            with profile_stage(profiler, 'image_to_video_pipeline', trace=True):
+                latents = self.pipe(
+                    image,
+                    num_frames=num_frames,
+                    num_inference_steps=25,
+                    min_guidance_scale=1.0,
+                    max_guidance_scale=3.0,
+                    output_type="latent"
+                ).frames
+            
+            # Only the VAE decode is retried with smaller plans
+            with profile_stage(profiler, 'vae_decode', trace=True):
+                frames = self.decode_planner.run(
+                    self.pipe,
+                    lambda chunk_size: decode_svd_latents(self.pipe, latents, num_frames, chunk_size),
+                    width=image.width,
+                    height=image.height,
+                    num_frames=num_frames
+                )
             
             if progress_callback:
                 progress_callback(80)
@@ -61,7 +91,7 @@ class ImageToVideoGenerator:
             if output_path is None:
                 output_path = f"output_{hash(image_path)}.mp4"
             
-            self._save_video(frames, output_path, fps)
+            self._save_video(frames, output_path, fps, profiler)
             
             if progress_callback:
                 progress_callback(100)
@@ -79,11 +109,13 @@ class ImageToVideoGenerator:
             print(f"❌ Error generating video: {e}")
             raise
     
-    def _save_video(self, frames, output_path, fps):
+    def _save_video(self, frames, output_path, fps, profiler=None):
         """Save frames as video file"""
-        # Convert PIL images to numpy arrays if needed
-        if isinstance(frames[0], Image.Image):
-            frames = [np.array(frame) for frame in frames]
+        with profile_stage(profiler, 'frame_conversion'):
+            # Convert PIL images to numpy arrays if needed
+            if isinstance(frames[0], Image.Image):
+                frames = [np.array(frame) for frame in frames]
         
-        # Save as MP4
-        imageio.mimsave(output_path, frames, fps=fps, codec='libx264')
+        with profile_stage(profiler, 'encode_video'):
+            # Save as MP4
+            imageio.mimsave(output_path, frames, fps=fps, codec='libx264')
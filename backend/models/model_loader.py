@@ -3,9 +3,29 @@ Model Loader - Handles loading and caching of AI models
 """
 
 import torch
-from diffusers import StableVideoDiffusionPipeline, DiffusionPipeline
+from diffusers import StableVideoDiffusionPipeline, StableDiffusionPipeline, DiffusionPipeline
+from safetensors import safe_open
 from pathlib import Path
+from contextlib import ExitStack
+import hashlib
+import json
 import os
+import re
+
+from config import Config
+
+# Weight file suffixes in order of preference (safetensors can be memory-mapped)
+WEIGHT_SUFFIXES = (".safetensors", ".bin")
+
+# Denoisers are model specific and by far the largest components; never worth fingerprinting
+UNSHARED_COMPONENTS = ("unet", "transformer")
+
+# Config keys that say where a component came from, not how it behaves
+CONFIG_PROVENANCE_KEYS = ("_name_or_path", "_diffusers_version", "transformers_version")
+
+# Hugging Face stores LFS blobs under their sha256, so the digest comes for free
+BLOB_SHA256 = re.compile(r"^[0-9a-f]{64}$")
+
 
 class ModelLoader:
     def __init__(self):
@@ -13,6 +33,14 @@ class ModelLoader:
         self.dtype = torch.float16 if self.device == "cuda" else torch.float32
         self.loaded_models = {}
         
+        # Shared component registry: component key -> loaded module
+        self.components = {}
+        # What each registered component was loaded from: component key -> {group, files, blobs}
+        self.component_sources = {}
+        # Which components each loaded pipeline is using: model_id -> {name: component key}
+        self.component_keys = {}
+        self._fingerprint_cache = {}
+        
         print(f"🖥️  Device: {self.device}")
         if self.device == "cuda":
             print(f"🎮 GPU: {torch.cuda.get_device_name(0)}")
@@ -25,25 +53,9 @@ class ModelLoader:
         
         print(f"📥 Loading {model_id}...")
         
-        pipe = StableVideoDiffusionPipeline.from_pretrained(
-            model_id,
-            torch_dtype=self.dtype,
-            variant="fp16" if self.device == "cuda" else None
-        )
-        
-        pipe = pipe.to(self.device)
+        pipe = self._load_pipeline(StableVideoDiffusionPipeline, model_id)
         
-        # Optimizations
-        if self.device == "cuda":
-            pipe.enable_attention_slicing()
-            pipe.enable_vae_slicing()
-            
-            # Try to enable xformers if available
-            try:
-                pipe.enable_xformers_memory_efficient_attention()
-                print("✅ xformers enabled")
-            except:
-                print("⚠️  xformers not available")
+        pipe = self._apply_optimizations(pipe)
         
         self.loaded_models[model_id] = pipe
         print(f"✅ Model loaded: {model_id}")
@@ -57,28 +69,242 @@ class ModelLoader:
         
         print(f"📥 Loading {model_id}...")
         
-        pipe = DiffusionPipeline.from_pretrained(
-            model_id,
-            torch_dtype=self.dtype,
-            variant="fp16" if self.device == "cuda" else None
-        )
+        pipe = self._load_pipeline(DiffusionPipeline, model_id)
         
-        pipe = pipe.to(self.device)
+        pipe = self._apply_optimizations(pipe)
         
-        # Optimizations
-        if self.device == "cuda":
-            pipe.enable_attention_slicing()
-            pipe.enable_vae_slicing()
+        self.loaded_models[model_id] = pipe
+        print(f"✅ Model loaded: {model_id}")
+        
+        return pipe
+    
+    def load_text_to_image(self, model_id="runwayml/stable-diffusion-v1-5"):
+        """Load Text-to-Image model (used to seed the image-to-video fallback)"""
+        if model_id in self.loaded_models:
+            return self.loaded_models[model_id]
+        
+        print(f"📥 Loading {model_id}...")
+        
+        pipe = self._load_pipeline(StableDiffusionPipeline, model_id)
+        
+        pipe = self._apply_optimizations(pipe)
         
         self.loaded_models[model_id] = pipe
         print(f"✅ Model loaded: {model_id}")
         
         return pipe
     
+    def _apply_optimizations(self, pipe):
+        """Move a pipeline to the device and apply the memory settings from Config"""
+        if self.device == "cuda" and Config.ENABLE_CPU_OFFLOAD:
+            # Keeps each model on the CPU until it runs (replaces pipe.to)
+            pipe.enable_model_cpu_offload()
+        else:
+            pipe = pipe.to(self.device)
+        
+        if Config.ENABLE_ATTENTION_SLICING:
+            pipe.enable_attention_slicing()
+        
+        # Initial VAE state; DecodePlanner adjusts slicing/tiling per video
+        if Config.ENABLE_VAE_SLICING and hasattr(pipe, 'enable_vae_slicing'):
+            pipe.enable_vae_slicing()
+        
+        if self.device == "cuda":
+            # Try to enable xformers if available
+            try:
+                pipe.enable_xformers_memory_efficient_attention()
+                print("✅ xformers enabled")
+            except:
+                print("⚠️  xformers not available")
+        
+        return pipe
+    
+    def _load_pipeline(self, pipeline_cls, model_id, variant="fp16"):
+        """
+        Load a pipeline, reusing any already loaded component that is identical
+        
+        A component is reused when its class, its config (minus provenance
+        fields) and its weights match. Weights are compared by LFS blob sha
+        first; tensors are only hashed (after the cast to the pipeline dtype)
+        when the class and config match but the files differ, e.g. one repo
+        ships fp32 files and the other an fp16 variant.
+        """
+        variant = variant if self.device == "cuda" else None
+        kwargs = {
+            'torch_dtype': self.dtype,
+            'variant': variant,
+            # Keep safetensors weights memory-mapped instead of copying them into
+            # freshly allocated tensors, so worker processes share them through
+            # the page cache
+            'low_cpu_mem_usage': Config.MMAP_WEIGHTS
+        }
+        
+        if not Config.SHARE_COMPONENTS:
+            return pipeline_cls.from_pretrained(model_id, **kwargs)
+        
+        pipeline_dir = self._resolve_pipeline_dir(pipeline_cls, model_id, variant)
+        sources = self._component_sources(pipeline_dir, variant)
+        
+        keys = {name: self._find_component(source) for name, source in sources.items()}
+        shared = {name: self.components[key] for name, key in keys.items() if key}
+        for name in shared:
+            print(f"♻️  Reusing shared component: {name}")
+        
+        pipe = pipeline_cls.from_pretrained(pipeline_dir, **kwargs, **shared)
+        
+        for name, source in sources.items():
+            if not keys[name]:
+                keys[name] = self._component_key(source)
+                self.components[keys[name]] = getattr(pipe, name)
+                self.component_sources[keys[name]] = source
+        self.component_keys[model_id] = keys
+        
+        return pipe
+    
+    def _resolve_pipeline_dir(self, pipeline_cls, model_id, variant):
+        """Get the local snapshot directory of a pipeline, downloading it if needed"""
+        if os.path.isdir(model_id):
+            return Path(model_id)
+        
+        return Path(pipeline_cls.download(model_id, variant=variant))
+    
+    def _component_sources(self, pipeline_dir, variant):
+        """Describe every shareable component listed in model_index.json"""
+        with open(pipeline_dir / "model_index.json") as f:
+            model_index = json.load(f)
+        
+        sources = {}
+        for name, spec in model_index.items():
+            if name.startswith("_") or name in UNSHARED_COMPONENTS:
+                continue
+            if not isinstance(spec, list) or spec[0] is None:
+                continue
+            
+            component_dir = pipeline_dir / name
+            if not component_dir.is_dir():
+                continue
+            
+            weight_files = self._select_weight_files(component_dir, variant)
+            if not weight_files:
+                continue
+            
+            # Identical weights are only interchangeable in the same class with
+            # the same config (scaling_factor, sample_size, ...)
+            sources[name] = {
+                'group': (f"{spec[0]}.{spec[1]}", self._config_digest(component_dir)),
+                'files': weight_files,
+                'blobs': self._blob_shas(weight_files)
+            }
+        
+        return sources
+    
+    def _config_digest(self, component_dir):
+        """Hash a component's config.json, ignoring where it was saved from"""
+        config_path = component_dir / "config.json"
+        if not config_path.exists():
+            return None
+        
+        with open(config_path) as f:
+            config = json.load(f)
+        for key in CONFIG_PROVENANCE_KEYS:
+            config.pop(key, None)
+        
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()
+    
+    def _blob_shas(self, weight_files):
+        """Get the LFS sha256 of each weight file from the hub cache, or None outside it"""
+        shas = tuple(os.path.basename(os.path.realpath(path)) for path in weight_files)
+        if all(BLOB_SHA256.match(sha) for sha in shas):
+            return shas
+        return None
+    
+    def _find_component(self, source):
+        """Get the key of a loaded component identical to source, or None"""
+        for key, loaded in self.component_sources.items():
+            if loaded['group'] != source['group']:
+                continue
+            
+            if source['blobs'] and loaded['blobs'] == source['blobs']:
+                return key
+            
+            # Same class and config but different files: compare the tensors
+            if self._weights_digest(loaded['files']) == self._weights_digest(source['files']):
+                return key
+        
+        return None
+    
+    def _component_key(self, source):
+        """Get a registry key unique to the files a component was loaded from"""
+        files = source['blobs'] or [os.path.realpath(path) for path in source['files']]
+        return f"{source['group'][0]}:{hashlib.sha256('|'.join(files).encode()).hexdigest()}"
+    
+    def _select_weight_files(self, component_dir, variant):
+        """Pick the weight files from_pretrained will load for a component"""
+        for suffix in WEIGHT_SUFFIXES:
+            files = sorted(p for p in component_dir.iterdir() if p.name.endswith(suffix))
+            variant_files = [p for p in files if variant and f".{variant}" in p.name]
+            plain_files = [p for p in files if len(p.name.split(".")) == 2]
+            
+            selected = variant_files or plain_files
+            if selected:
+                return selected
+        
+        return []
+    
+    def _weights_digest(self, weight_files):
+        """
+        Hash the tensors of a component as they will be loaded
+        
+        Tensors are hashed by name in sorted order after casting floating point
+        weights to the pipeline dtype, so the digest doesn't depend on how the
+        weights are sharded or which precision the files are stored in.
+        """
+        stats = [os.stat(path) for path in weight_files]
+        cache_key = (
+            tuple((os.path.realpath(path), st.st_size, st.st_mtime) for path, st in zip(weight_files, stats)),
+            str(self.dtype)
+        )
+        if cache_key in self._fingerprint_cache:
+            return self._fingerprint_cache[cache_key]
+        
+        digest = hashlib.sha256(str(self.dtype).encode())
+        
+        with ExitStack() as stack:
+            tensors = {}
+            for path in weight_files:
+                if path.name.endswith(".safetensors"):
+                    # Memory-mapped: one tensor is materialised at a time
+                    f = stack.enter_context(safe_open(str(path), framework="pt"))
+                    tensors.update({key: f for key in f.keys()})
+                else:
+                    state_dict = torch.load(path, map_location="cpu", weights_only=True, mmap=True)
+                    tensors.update({key: state_dict for key in state_dict})
+            
+            for key in sorted(tensors):
+                source = tensors[key]
+                tensor = source.get_tensor(key) if hasattr(source, "get_tensor") else source[key]
+                if tensor.is_floating_point():
+                    tensor = tensor.to(self.dtype)
+                
+                digest.update(f"{key}:{tuple(tensor.shape)}".encode())
+                digest.update(tensor.contiguous().view(-1).view(torch.uint8).numpy())
+        
+        self._fingerprint_cache[cache_key] = digest.hexdigest()
+        return self._fingerprint_cache[cache_key]
+    
     def unload_model(self, model_id):
         """Unload a model to free memory"""
         if model_id in self.loaded_models:
             del self.loaded_models[model_id]
+            
+            # Drop shared components that no other loaded pipeline still uses
+            released = set(self.component_keys.pop(model_id, {}).values())
+            for fingerprints in self.component_keys.values():
+                released -= set(fingerprints.values())
+            for key in released:
+                del self.components[key]
+                del self.component_sources[key]
+            
             if self.device == "cuda":
                 torch.cuda.empty_cache()
             print(f"🗑️  Model unloaded: {model_id}")
@@ -9,10 +9,16 @@ import numpy as np
 from pathlib import Path
 import imageio
 
+from config import Config
+from models.decode_planner import DecodePlanner
+from models.image_to_video import decode_svd_latents
+from profiling import profile_stage
+
 class TextToVideoGenerator:
     def __init__(self, model_loader):
         self.model_loader = model_loader
         self.pipe = None
+        self.decode_planner = DecodePlanner(model_loader)
         self.load_model()
     
     def load_model(self):
@@ -25,7 +31,7 @@ class TextToVideoGenerator:
             # Fallback: We'll generate an image first, then use SVD
             self.pipe = None
     
-    def generate(self, prompt, num_frames=24, fps=8, output_path=None, progress_callback=None):
+    def generate(self, prompt, num_frames=24, fps=8, output_path=None, progress_callback=None, profiler=None):
         """
         Generate video from text prompt
         
@@ -35,6 +41,7 @@ class TextToVideoGenerator:
             fps: Frames per second
             output_path: Where to save the video
             progress_callback: Function to call with progress updates
+            profiler: Optional JobProfiler recording each stage
         
         Returns:
             dict with output_path and metadata
@@ -46,19 +53,35 @@ class TextToVideoGenerator:
         
         if self.pipe is None:
             # Fallback method: Generate image first, then animate
-            return self._generate_via_image(prompt, num_frames, fps, output_path, progress_callback)
+            return self._generate_via_image(prompt, num_frames, fps, output_path, progress_callback, profiler)
         
         try:
             # Generate video frames
             if progress_callback:
                 progress_callback(30)
             
-            video_frames = self.pipe(
-                prompt,
-                num_frames=num_frames,
-                num_inference_steps=25,
-                guidance_scale=9.0
-            ).frames
+            # Denoise once; an out-of-memory here fails the job
+            with profile_stage(profiler, 'text_to_video_pipeline', trace=True):
+                latents = self.pipe(
+                    prompt,
+                    num_frames=num_frames,
+                    num_inference_steps=25,
+                    guidance_scale=9.0,
+                    output_type="latent"
+                ).frames
+            
+            # This pipeline has no decode chunk size: the planner can only toggle
+            # VAE slicing (one frame per call) and tiling between retries
+            size = self.pipe.unet.config.sample_size * self.pipe.vae_scale_factor
+            with profile_stage(profiler, 'vae_decode', trace=True):
+                video_frames = self.decode_planner.run(
+                    self.pipe,
+                    lambda chunk_size: self._decode_latents(latents),
+                    width=size,
+                    height=size,
+                    num_frames=num_frames,
+                    chunked=False
+                )
             
             if progress_callback:
                 progress_callback(80)
@@ -67,7 +90,7 @@ class TextToVideoGenerator:
             if output_path is None:
                 output_path = f"output_{hash(prompt)}.mp4"
             
-            self._save_video(video_frames[0], output_path, fps)
+            self._save_video(video_frames, output_path, fps, profiler)
             
             if progress_callback:
                 progress_callback(100)
@@ -85,25 +108,26 @@ class TextToVideoGenerator:
             print(f"❌ Error generating video: {e}")
             raise
     
-    def _generate_via_image(self, prompt, num_frames, fps, output_path, progress_callback):
+    def _generate_via_image(self, prompt, num_frames, fps, output_path, progress_callback, profiler=None):
         """
         Fallback: Generate image first, then animate with SVD
         """
-        from diffusers import StableDiffusionPipeline
-        
         print("📸 Generating initial image from prompt...")
         
-        # Load Stable Diffusion for image generation
-        sd_pipe = StableDiffusionPipeline.from_pretrained(
-            "runwayml/stable-diffusion-v1-5",
-            torch_dtype=self.model_loader.get_dtype()
-        ).to(self.model_loader.get_device())
+        # Load Stable Diffusion for image generation (shares components with loaded pipelines)
+        sd_model_id = Config.MODELS["text-to-image"]
+        sd_pipe = self.model_loader.load_text_to_image(sd_model_id)
         
         if progress_callback:
             progress_callback(20)
         
         # Generate image
-        image = sd_pipe(prompt, num_inference_steps=30).images[0]
+        with profile_stage(profiler, 'text_to_image_pipeline', trace=True):
+            image = sd_pipe(prompt, num_inference_steps=30).images[0]
+        
+        # Free Stable Diffusion again; components other pipelines use stay loaded
+        del sd_pipe
+        self.model_loader.unload_model(sd_model_id)
         
         if progress_callback:
             progress_callback(40)
@@ -115,11 +139,18 @@ class TextToVideoGenerator:
         if progress_callback:
             progress_callback(60)
         
-        frames = svd_pipe(
-            image,
-            num_frames=num_frames,
-            decode_chunk_size=8
-        ).frames[0]
+        with profile_stage(profiler, 'image_to_video_pipeline', trace=True):
+            # SVD resizes its input to its default 1024x576 output
+            latents = svd_pipe(image, num_frames=num_frames, output_type="latent").frames
+        
+        with profile_stage(profiler, 'vae_decode', trace=True):
+            frames = self.decode_planner.run(
+                svd_pipe,
+                lambda chunk_size: decode_svd_latents(svd_pipe, latents, num_frames, chunk_size),
+                width=1024,
+                height=576,
+                num_frames=num_frames
+            )
         
         if progress_callback:
             progress_callback(90)
@@ -128,7 +159,7 @@ class TextToVideoGenerator:
         if output_path is None:
             output_path = f"output_{hash(prompt)}.mp4"
         
-        self._save_video(frames, output_path, fps)
+        self._save_video(frames, output_path, fps, profiler)
         
         if progress_callback:
             progress_callback(100)
@@ -142,11 +173,24 @@ class TextToVideoGenerator:
             'prompt': prompt
         }
     
-    def _save_video(self, frames, output_path, fps):
-        """Save frames as video file"""
-        # Convert PIL images to numpy arrays if needed
-        if isinstance(frames[0], Image.Image):
-            frames = [np.array(frame) for frame in frames]
+    def _decode_latents(self, latents):
+        """Decode text-to-video latents to the frames of the first video"""
+        video = self.pipe.decode_latents(latents)
+        
+        if hasattr(self.pipe, 'video_processor'):
+            return self.pipe.video_processor.postprocess_video(video=video, output_type="pil")[0]
         
-        # Save as MP4
-        imageio.mimsave(output_path, frames, fps=fps, codec='libx264')
+        # diffusers < 0.27 (a list of uint8 frames with the batch side by side)
+        from diffusers.pipelines.text_to_video_synthesis.pipeline_text_to_video_synth import tensor2vid
+        return tensor2vid(video)
+    
+    def _save_video(self, frames, output_path, fps, profiler=None):
+        """Save frames as video file"""
+        with profile_stage(profiler, 'frame_conversion'):
+            # Convert PIL images to numpy arrays if needed
+            if isinstance(frames[0], Image.Image):
+                frames = [np.array(frame) for frame in frames]
+        
+        with profile_stage(profiler, 'encode_video'):
+            # Save as MP4
+            imageio.mimsave(output_path, frames, fps=fps, codec='libx264')
@@ -0,0 +1,166 @@
+"""
+Job Profiler - On-demand profiling of individual generation jobs
+Only jobs submitted with `profile` set create a profiler; every other job
+runs the generators exactly as before.
+"""
+
+import cProfile
+import json
+import os
+import pstats
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import psutil
+import torch
+from torch.profiler import profile, ProfilerActivity
+
+from config import Config
+
+
+def profile_stage(profiler, name, trace=False):
+    """Time a stage of a job if it is being profiled (no-op otherwise)"""
+    if profiler is None:
+        return nullcontext()
+    return profiler.stage(name, trace=trace)
+
+
+class JobProfiler:
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.output_dir = Config.PROFILE_DIR / job_id
+        self.stages = []
+        self.cprofile = cProfile.Profile()
+        self.process = psutil.Process()
+        self.started_at = None
+        
+        os.makedirs(self.output_dir, exist_ok=True)
+    
+    def start(self):
+        """Start Python-side profiling and memory tracking for the job"""
+        self.started_at = time.perf_counter()
+        tracemalloc.start()
+        if torch.cuda.is_available():
+            torch.cuda.reset_peak_memory_stats()
+            torch.cuda.memory._record_memory_history()
+        self.cprofile.enable()
+    
+    @contextmanager
+    def stage(self, name, trace=False):
+        """
+        Record wall time and memory of a stage
+        
+        With trace=True the stage also runs under the torch profiler and its
+        Chrome trace is saved as `<name>.trace.json`.
+        """
+        rss_before = self.process.memory_info().rss
+        if torch.cuda.is_available():
+            # Peak of this stage only, not of the job so far
+            torch.cuda.reset_peak_memory_stats()
+        start = time.perf_counter()
+        failed = False
+        prof = None
+        
+        # Record the stage even if it raises, so failed jobs can be profiled too
+        try:
+            if trace:
+                activities = [ProfilerActivity.CPU]
+                if torch.cuda.is_available():
+                    activities.append(ProfilerActivity.CUDA)
+                
+                with profile(activities=activities, record_shapes=True, profile_memory=True) as prof:
+                    yield
+            else:
+                yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            end = time.perf_counter()
+            
+            if prof is not None:
+                try:
+                    prof.export_chrome_trace(str(self.output_dir / f"{name}.trace.json"))
+                except Exception as e:
+                    print(f"⚠️  Could not export trace for stage {name}: {str(e)}")
+            
+            stage = {
+                'name': name,
+                'start': start - self.started_at,
+                'duration': end - start,
+                'rss_before_mb': rss_before / 1024**2,
+                'rss_after_mb': self.process.memory_info().rss / 1024**2
+            }
+            if torch.cuda.is_available():
+                stage['cuda_peak_mb'] = torch.cuda.max_memory_allocated() / 1024**2
+            if failed:
+                stage['failed'] = True
+            self.stages.append(stage)
+    
+    def finish(self):
+        """Stop profiling and write all artifacts for the job"""
+        self.cprofile.disable()
+        duration = time.perf_counter() - self.started_at
+        
+        self.cprofile.dump_stats(str(self.output_dir / "cprofile.prof"))
+        
+        snapshot = tracemalloc.take_snapshot()
+        _, python_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        
+        if torch.cuda.is_available():
+            torch.cuda.memory._dump_snapshot(str(self.output_dir / "cuda_memory.pickle"))
+            torch.cuda.memory._record_memory_history(enabled=None)
+        
+        summary = {
+            'job_id': self.job_id,
+            'duration': duration,
+            'stages': self.stages,
+            'python_peak_mb': python_peak / 1024**2,
+            'top_functions': self._top_functions(),
+            'top_allocations': [
+                {'location': str(stat.traceback), 'size_mb': stat.size / 1024**2, 'count': stat.count}
+                for stat in snapshot.statistics('lineno')[:Config.PROFILE_TOP_N]
+            ]
+        }
+        
+        with open(self.output_dir / "summary.json", "w") as f:
+            json.dump(summary, f, indent=2)
+        
+        # Stage timeline in Chrome trace format, viewable next to the torch traces
+        with open(self.output_dir / "timeline.json", "w") as f:
+            json.dump({'traceEvents': [
+                {
+                    'name': stage['name'],
+                    'ph': 'X',
+                    'ts': stage['start'] * 1e6,
+                    'dur': stage['duration'] * 1e6,
+                    'pid': 0,
+                    'tid': 0
+                }
+                for stage in self.stages
+            ]}, f)
+        
+        print(f"🔬 Profile saved to: {self.output_dir}")
+        
+        return self.artifacts()
+    
+    def artifacts(self):
+        """List the artifact files written for the job"""
+        return sorted(os.listdir(self.output_dir))
+    
+    def _top_functions(self):
+        """Get the functions with the highest cumulative time from cProfile"""
+        stats = pstats.Stats(self.cprofile)
+        rows = [
+            {
+                'function': f"{filename}:{line}({name})",
+                'calls': calls,
+                'total_time': total_time,
+                'cumulative_time': cumulative_time
+            }
+            for (filename, line, name), (_, calls, total_time, cumulative_time, _) in stats.stats.items()
+        ]
+        rows.sort(key=lambda row: row['cumulative_time'], reverse=True)
+        return rows[:Config.PROFILE_TOP_N]
@@ -0,0 +1,162 @@
+"""
+Decode Benchmark Script
+Measures peak memory and time of VAE decoding on CPU across decode plans
+(frames per chunk, tiled or not) and shows the plan DecodePlanner would pick
+"""
+
+import os
+import sys
+import json
+import time
+import resource
+import subprocess
+from pathlib import Path
+import argparse
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def load_vae(args):
+    """Load a VAE, or build a randomly initialised SD/SVD-architecture VAE (no download)"""
+    from diffusers import AutoencoderKL, AutoencoderKLTemporalDecoder
+    
+    vae_cls = AutoencoderKLTemporalDecoder if args.temporal else AutoencoderKL
+    if args.vae:
+        return vae_cls.from_pretrained(args.vae, subfolder=args.subfolder)
+    
+    if args.temporal:
+        return AutoencoderKLTemporalDecoder(
+            in_channels=3,
+            out_channels=3,
+            down_block_types=["DownEncoderBlock2D"] * 4,
+            block_out_channels=[128, 256, 512, 512],
+            layers_per_block=2,
+            latent_channels=4,
+            sample_size=768
+        )
+    
+    return AutoencoderKL(
+        in_channels=3,
+        out_channels=3,
+        down_block_types=["DownEncoderBlock2D"] * 4,
+        up_block_types=["UpDecoderBlock2D"] * 4,
+        block_out_channels=[128, 256, 512, 512],
+        layers_per_block=2,
+        latent_channels=4,
+        sample_size=512
+    )
+
+
+def measure(args):
+    """Decode once with the plan given on the command line and print results as JSON"""
+    import torch
+    
+    torch.manual_seed(0)
+    vae = load_vae(args).eval()
+    
+    if args.tiled:
+        vae.enable_tiling()
+        vae.tile_sample_min_size = args.tile_size
+        vae.tile_latent_min_size = args.tile_size // 8
+    
+    latents = torch.randn(args.frames, vae.config.latent_channels, args.height // 8, args.width // 8)
+    
+    # ru_maxrss is the peak so far (KB on Linux); the decode's cost is the increase
+    peak_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    
+    with torch.no_grad():
+        for i in range(0, args.frames, args.chunk_size):
+            chunk = latents[i:i + args.chunk_size]
+            # The temporal decoder mixes information across the frames of a chunk
+            kwargs = {'num_frames': chunk.shape[0]} if args.temporal else {}
+            vae.decode(chunk, **kwargs).sample
+    
+    duration = time.perf_counter() - start
+    peak_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    print(json.dumps({
+        'duration': duration,
+        'peak_mb': (peak_after - peak_before) / 1024
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark VAE decode plans on CPU')
+    parser.add_argument('--vae', type=str, default=None, help='VAE model id (default: random SD-sized VAE)')
+    parser.add_argument('--subfolder', type=str, default='vae', help='Subfolder of the VAE in the model repo')
+    parser.add_argument('--temporal', action='store_true', help='Use the Stable Video Diffusion temporal decoder VAE')
+    parser.add_argument('--width', type=int, default=512, help='Output width (default: 512)')
+    parser.add_argument('--height', type=int, default=320, help='Output height (default: 320)')
+    parser.add_argument('--frames', type=int, default=8, help='Frames to decode (default: 8)')
+    parser.add_argument('--chunks', type=str, default='1,2,4,8', help='Chunk sizes to try (default: 1,2,4,8)')
+    parser.add_argument('--tile-size', type=int, default=256, help='Tile size in pixels for tiled plans (default: 256)')
+    parser.add_argument('--chunk-size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--tiled', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    
+    args = parser.parse_args()
+    
+    if args.child:
+        measure(args)
+        return
+    
+    # Plan for the CPU, the same device the measurements below run on
+    os.environ['CUDA_VISIBLE_DEVICES'] = ''
+    
+    from models.model_loader import ModelLoader
+    from models.decode_planner import DecodePlanner
+    
+    planner = DecodePlanner(ModelLoader())
+    # The temporal decoder has no tiled mode
+    tiled_plans = (False,) if args.temporal else (False, True)
+    chosen = planner.plan(args.width, args.height, args.frames, can_tile=not args.temporal)
+    element_size = 4  # float32 on CPU
+    
+    print(f"\n🎞️  Decoding {args.frames} frames at {args.width}x{args.height} on CPU")
+    print(f"🧮 Planner would pick: {chosen['chunk_size']} frame(s) per chunk, tiled={chosen['tiled']}\n")
+    
+    results = []
+    for tiled in tiled_plans:
+        for chunk_size in [int(c) for c in args.chunks.split(',')]:
+            if chunk_size > args.frames:
+                continue
+            
+            command = [
+                sys.executable, __file__, '--child',
+                '--width', str(args.width), '--height', str(args.height),
+                '--frames', str(args.frames), '--chunk-size', str(chunk_size),
+                '--tile-size', str(args.tile_size), '--subfolder', args.subfolder
+            ]
+            if args.vae:
+                command += ['--vae', args.vae]
+            if args.temporal:
+                command.append('--temporal')
+            if tiled:
+                command.append('--tiled')
+            
+            # Each plan runs in a fresh process so peak memory isn't shared between runs
+            print(f"📊 Measuring: chunk={chunk_size} tiled={tiled}")
+            output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            results.append((chunk_size, tiled, result))
+    
+    print("\n" + "="*60)
+    print(f"{'chunk':>6} {'tiled':>6} {'time':>10} {'peak':>12} {'act/pixel':>10}")
+    for chunk_size, tiled, result in results:
+        pixels = chunk_size * args.width * args.height
+        activations = result['peak_mb'] * 1024**2 / element_size / pixels
+        print(
+            f"{chunk_size:>6} {str(tiled):>6} "
+            f"{result['duration']:>8.2f} s "
+            f"{result['peak_mb']:>9.0f} MB "
+            f"{activations:>10.0f}"
+        )
+    print("="*60 + "\n")
+    print("💡 `act/pixel` for untiled plans is a measured value for")
+    print("   Config.DECODE_ACTIVATIONS_PER_PIXEL on this VAE.\n")
+
+
+if __name__ == "__main__":
+    main()
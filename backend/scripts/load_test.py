@@ -0,0 +1,153 @@
+"""
+Load Test Script
+Opens many concurrent keep-alive connections against the API (optionally while
+slow clients trickle uploads) and reports throughput and tail latency.
+Run it once against `python app.py` and once against `python serve.py`.
+"""
+
+import asyncio
+import time
+import argparse
+from urllib.parse import urlsplit
+
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+    
+    def percentile(self, p):
+        ordered = sorted(self.latencies)
+        if not ordered:
+            return float('nan')
+        index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+        return ordered[index] * 1000
+
+
+async def read_response(reader):
+    """Read one HTTP/1.1 response; returns (status, keep_alive)"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('Connection closed')
+    status = int(status_line.split()[1])
+    
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if size == 0:
+                break
+    elif 'content-length' in headers:
+        await reader.readexactly(int(headers['content-length']))
+    else:
+        await reader.read()
+        return status, False
+    
+    return status, headers.get('connection', '').lower() != 'close'
+
+
+async def client(host, port, path, num_requests, stats, timeout):
+    """One keep-alive connection issuing requests back to back"""
+    request = f"GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: keep-alive\r\n\r\n".encode()
+    reader = writer = None
+    
+    for _ in range(num_requests):
+        start = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.write(request)
+            await writer.drain()
+            status, keep_alive = await asyncio.wait_for(read_response(reader), timeout)
+            if status >= 500:
+                raise ConnectionError(f'HTTP {status}')
+            stats.latencies.append(time.perf_counter() - start)
+        except (OSError, ConnectionError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError, IndexError):
+            stats.errors += 1
+            keep_alive = False
+        
+        if not keep_alive and writer is not None:
+            writer.close()
+            reader = writer = None
+    
+    if writer is not None:
+        writer.close()
+
+
+async def slow_upload(host, port, stop):
+    """Trickle a multipart upload at ~1 KB/s until told to stop"""
+    boundary = 'loadtestboundary'
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write((
+            f"POST /api/generate/image-to-video HTTP/1.1\r\nHost: {host}\r\n"
+            f"Content-Type: multipart/form-data; boundary={boundary}\r\n"
+            f"Content-Length: {100 * 1024 * 1024}\r\n\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"image\"; filename=\"slow.png\"\r\n"
+            f"Content-Type: image/png\r\n\r\n"
+        ).encode())
+        while not stop.is_set():
+            writer.write(b'\0' * 1024)
+            await writer.drain()
+            await asyncio.sleep(1)
+        writer.close()
+    except OSError:
+        pass
+
+
+async def run(args):
+    url = urlsplit(args.url)
+    host, port = url.hostname, url.port or 80
+    
+    stop = asyncio.Event()
+    uploads = [asyncio.create_task(slow_upload(host, port, stop)) for _ in range(args.slow_uploads)]
+    if uploads:
+        # Let the slow uploads occupy the server before measuring
+        await asyncio.sleep(2)
+    
+    stats = Stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        client(host, port, args.path, args.requests, stats, args.timeout)
+        for _ in range(args.connections)
+    ))
+    elapsed = time.perf_counter() - start
+    
+    stop.set()
+    await asyncio.gather(*uploads)
+    
+    print("\n" + "="*60)
+    print(f"🎯 {args.url}{args.path}")
+    print(f"🔌 {args.connections} connections x {args.requests} requests, {args.slow_uploads} slow uploads")
+    print(f"✅ OK: {len(stats.latencies)}   ❌ Errors: {stats.errors}")
+    print(f"⚡ Throughput: {len(stats.latencies) / elapsed:.1f} req/s")
+    print(
+        f"⏱️  Latency p50 {stats.percentile(50):.1f} ms | p95 {stats.percentile(95):.1f} ms | "
+        f"p99 {stats.percentile(99):.1f} ms | max {stats.percentile(100):.1f} ms"
+    )
+    print("="*60 + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the Kling AI Clone API')
+    parser.add_argument('--url', type=str, default='http://localhost:5000', help='Server base URL')
+    parser.add_argument('--path', type=str, default='/api/health', help='Path to request (default: /api/health)')
+    parser.add_argument('--connections', type=int, default=200, help='Concurrent connections (default: 200)')
+    parser.add_argument('--requests', type=int, default=20, help='Requests per connection (default: 20)')
+    parser.add_argument('--slow-uploads', type=int, default=0, help='Slow upload clients held open during the test')
+    parser.add_argument('--timeout', type=float, default=10, help='Per-request timeout in seconds (default: 10)')
+    
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Memory Report Script
+Loads every pipeline the server uses and reports process memory with and
+without shared components / memory-mapped weights
+"""
+
+import os
+import sys
+import json
+import subprocess
+from pathlib import Path
+import argparse
+import psutil
+
+# Add parent directory to path
+sys.path.append(str(Path(__file__).parent.parent))
+
+MODES = {
+    'baseline': {'SHARE_COMPONENTS': 'False', 'MMAP_WEIGHTS': 'False'},
+    'mmap': {'SHARE_COMPONENTS': 'False', 'MMAP_WEIGHTS': 'True'},
+    'shared': {'SHARE_COMPONENTS': 'True', 'MMAP_WEIGHTS': 'True'}
+}
+
+# What the server loads: loader method -> model id (None = the loader's default)
+DEFAULT_LOADS = [
+    ('load_stable_video_diffusion', None),
+    ('load_text_to_video', None),
+    ('load_text_to_image', None)
+]
+
+
+def memory_snapshot():
+    """Get resident (RSS), private (USS) and proportional (PSS) memory in MB"""
+    info = psutil.Process().memory_full_info()
+    return {
+        'rss': info.rss / 1024**2,
+        'uss': info.uss / 1024**2,
+        'pss': getattr(info, 'pss', info.uss) / 1024**2
+    }
+
+
+def measure(loads):
+    """Load the models in this process, wait for the go signal, then print memory as JSON"""
+    import torch
+    from models.model_loader import ModelLoader
+    
+    before = memory_snapshot()
+    
+    model_loader = ModelLoader()
+    for method, model_id in loads:
+        load = getattr(model_loader, method)
+        load(model_id) if model_id else load()
+    
+    # Read every weight once, as the first generation would; memory-mapped weights
+    # only become resident when touched
+    with torch.no_grad():
+        for pipe in model_loader.loaded_models.values():
+            for component in pipe.components.values():
+                if isinstance(component, torch.nn.Module):
+                    for tensor in component.state_dict().values():
+                        tensor.sum()
+    
+    # All workers load before any of them is measured, so PSS splits shared pages
+    print("ready", flush=True)
+    sys.stdin.readline()
+    
+    after = memory_snapshot()
+    
+    print(json.dumps({
+        'before': before,
+        'after': after,
+        'shared_components': len(model_loader.components)
+    }), flush=True)
+
+
+def parse_load(value):
+    """Parse a --load argument of the form loader=model_id"""
+    loader, _, model_id = value.partition('=')
+    return (f"load_{loader.replace('-', '_')}", model_id or None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report memory used with all models loaded')
+    parser.add_argument(
+        '--mode',
+        type=str,
+        choices=['all'] + list(MODES),
+        default='all',
+        help='Which loading mode to measure (default: all)'
+    )
+    parser.add_argument(
+        '--load',
+        type=parse_load,
+        action='append',
+        help='Model to load as loader=model_id, e.g. text_to_image=/path/to/pipeline '
+             '(repeatable; default: every model the server loads)'
+    )
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes loading the models at once (default: 1)')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    
+    args = parser.parse_args()
+    loads = args.load or DEFAULT_LOADS
+    
+    if args.child:
+        measure(loads)
+        return
+    
+    modes = list(MODES) if args.mode == 'all' else [args.mode]
+    load_args = [f"--load={method[len('load_'):]}={model_id or ''}" for method, model_id in loads]
+    results = {}
+    
+    for mode in modes:
+        print(f"📊 Measuring: {mode} ({args.workers} worker(s))")
+        
+        # Each mode runs in fresh interpreters so allocations don't carry over
+        env = {**os.environ, **MODES[mode]}
+        workers = [
+            subprocess.Popen(
+                [sys.executable, __file__, '--child', *load_args],
+                env=env,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True
+            )
+            for _ in range(args.workers)
+        ]
+        
+        for worker in workers:
+            while worker.stdout.readline().strip() != 'ready':
+                if worker.poll() is not None:
+                    raise RuntimeError(f"Worker failed while loading models in mode {mode}")
+        
+        for worker in workers:
+            worker.stdin.write("go\n")
+            worker.stdin.flush()
+        
+        results[mode] = [json.loads(worker.stdout.readline()) for worker in workers]
+        for worker in workers:
+            worker.wait()
+    
+    print("\n" + "="*72)
+    print(f"{'mode':<10} {'RSS before':>12} {'RSS after':>12} {'USS after':>12} {'PSS after':>12} {'PSS total':>12}")
+    for mode, worker_results in results.items():
+        result = worker_results[0]
+        pss_total = sum(r['after']['pss'] for r in worker_results)
+        print(
+            f"{mode:<10} "
+            f"{result['before']['rss']:>9.0f} MB "
+            f"{result['after']['rss']:>9.0f} MB "
+            f"{result['after']['uss']:>9.0f} MB "
+            f"{result['after']['pss']:>9.0f} MB "
+            f"{pss_total:>9.0f} MB"
+        )
+    print("="*72 + "\n")
+    print("💡 Per-worker columns are for the first worker. USS is memory private to")
+    print("   the process; PSS total is the physical memory used by all workers, with")
+    print("   memory-mapped weights counted once.\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Kling AI Clone - Production Server
+Runs the API under uvicorn (ASGI) instead of the Flask development server
+"""
+
+import uvicorn
+
+from config import Config
+import app as api
+from asgi import asgi_app
+
+
+def main():
+    # Start background worker thread
+    api.start_worker()
+    
+    # Initialize models
+    api.initialize_models()
+    
+    print(f"\n🚀 Server starting on http://{Config.HOST}:{Config.PORT}")
+    print(f"📁 Output directory: {Config.OUTPUT_DIR}")
+    print(f"📁 Model directory: {Config.MODEL_DIR}\n")
+    
+    # Models, the job queue and job status all live in this process, so it has
+    # to be the only worker; concurrency comes from the event loop instead
+    uvicorn.run(
+        asgi_app,
+        host=Config.HOST,
+        port=Config.PORT,
+        workers=1,
+        limit_concurrency=Config.SERVER_LIMIT_CONCURRENCY,
+        timeout_keep_alive=Config.SERVER_KEEP_ALIVE,
+        log_level=Config.LOG_LEVEL.lower()
+    )
+
+
+if __name__ == '__main__':
+    main()